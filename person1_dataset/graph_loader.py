@@ -1,35 +1,66 @@
 # graph_loader.py
 # This file loads the nodes.json and edges.json files
 # and builds the graph structure (adjacency list)
+import functools
 import json
+import os
+from array import array
+from collections import defaultdict
 from typing import Dict, List, Tuple
 
+# ijson is optional, with it edges.json is parsed one edge at a time
+# instead of loading the whole file first
+try:
+    import ijson
+    HAVE_IJSON = True
+except ImportError:
+    HAVE_IJSON = False
+
+# orjson is optional too, its a lot faster than json for the whole-file reads
+try:
+    import orjson as _json_fast
+except ImportError:
+    _json_fast = None
+
+def _read_json(f):
+    # f is opened in binary mode
+    if _json_fast is not None:
+        return _json_fast.loads(f.read())
+    return json.load(f)
+
 def load_nodes(path="data/nodes.json"):
     # just reads the nodes.json file into a dict
-    with open(path, "r", encoding="utf-8") as f:
-        raw = json.load(f)
+    with open(path, "rb") as f:
+        raw = _read_json(f)
     nodes = {}
     for n in raw:
         nid = n["id"]
         nodes[nid] = {"id": nid, "name": n.get("name", nid)}
     return nodes
 
-def load_edges(path="data/edges.json"):
-    # just reads the edges.json file into a list
-    with open(path, "r", encoding="utf-8") as f:
-        edges = json.load(f)
+def iter_edges(path="data/edges.json"):
+    # yields the edges one by one, already fixed up (id, distance_m)
+    with open(path, "rb") as f:
+        if HAVE_IJSON:
+            raw = ijson.items(f, "item", use_float=True)
+        else:
+            raw = _read_json(f)
 
+        # tuple keys, so no string gets built unless an id is actually missing
+        counter = defaultdict(int)
+        for e in raw:
+            u = e.get("u"); v = e.get("v")
+            key = (u, v)
+            counter[key] += 1
+            if "id" not in e:
+                e["id"] = f"{u}-{v}-{counter[key]}"
+            if "distance" in e and "distance_m" not in e:
+                e["distance_m"] = e["distance"] # fix missing key
+            yield e
 
-    counter = {}
-    for e in edges:
-        u = e.get("u"); v = e.get("v")
-        key = f"{u}-{v}"
-        counter[key] = counter.get(key, 0) + 1
-        if "id" not in e:
-            e["id"] = f"{u}-{v}-{counter[key]}"
-        if "distance" in e and "distance_m" not in e:
-            e["distance_m"] = e["distance"] # fix missing key
-    return edges
+def load_edges(path="data/edges.json"):
+    # just reads the edges.json file into a list
+    return list(iter_edges(path))
 
 def build_graph(nodes_path="data/nodes.json", edges_path="data/edges.json"):
     """
@@ -37,13 +68,24 @@ def build_graph(nodes_path="data/nodes.json", edges_path="data/edges.json"):
       nodes: (dict) all the nodes
       edges: (list) all the edges
       adj: (dict) the adjacency list
+
+    Results are cached until one of the files changes, so the same
+    objects come back on every call. Treat them as read-only.
     """
+    return _build_graph_cached(os.path.abspath(nodes_path), os.stat(nodes_path).st_mtime_ns,
+                               os.path.abspath(edges_path), os.stat(edges_path).st_mtime_ns)
+
+@functools.lru_cache(maxsize=8)
+def _build_graph_cached(nodes_path, nodes_mtime, edges_path, edges_mtime):
+    # the mtimes are only here for the cache key, if a file is edited
+    # the key changes and it gets parsed again
     nodes = load_nodes(nodes_path)
-    edges = load_edges(edges_path)
 
-    # create the adjacency list
+    # create the adjacency list while the edges are being read
+    edges = []
     adj = {nid: [] for nid in nodes}
-    for e in edges:
+    for e in iter_edges(edges_path):
+        edges.append(e)
         u = e["u"]; v = e["v"]
         if u not in adj: adj[u] = []
         if v not in adj: adj[v] = []
@@ -56,6 +98,71 @@ def build_graph(nodes_path="data/nodes.json", edges_path="data/edges.json"):
         
     return nodes, edges, adj
 
+def build_csr(nodes, edges):
+    """
+    Packs the graph into CSR form (compressed sparse rows) so the
+    pathfinder can walk flat int arrays instead of the dict of lists.
+    Returns a dict with:
+      node_to_idx: (dict) node id -> int index
+      idx_to_node: (list) int index -> node id
+      indptr: (array) neighbours of node i sit in slots indptr[i]..indptr[i+1]
+      indices: (array) neighbour index for each slot
+      edge_idx: (array) int edge index for each slot (position in edges)
+      edge_list: (list) the edges, indexed by edge_idx
+      weights: (array) distance_m for each edge, indexed by edge_idx
+      eid_to_idx: (dict) edge id -> int edge index
+    The arrays are stdlib array.array, numpy is optional (the pathfinder
+    wraps them with np.frombuffer when its there, no copy needed).
+    """
+    node_to_idx = {}
+    idx_to_node = []
+    for nid in nodes:
+        node_to_idx[nid] = len(idx_to_node)
+        idx_to_node.append(nid)
+    for e in edges:
+        for nid in (e["u"], e["v"]):
+            if nid not in node_to_idx:
+                node_to_idx[nid] = len(idx_to_node)
+                idx_to_node.append(nid)
+    n = len(idx_to_node)
+
+    # first pass: count degrees (undirected, so both ends)
+    deg = [0] * n
+    for e in edges:
+        deg[node_to_idx[e["u"]]] += 1
+        deg[node_to_idx[e["v"]]] += 1
+
+    indptr = array("i", [0]) * (n + 1)
+    for i in range(n):
+        indptr[i + 1] = indptr[i] + deg[i]
+
+    # second pass: fill the slots using a cursor per node
+    n_slots = indptr[n]
+    indices = array("i", [0]) * n_slots
+    edge_idx = array("i", [0]) * n_slots
+    cursor = list(indptr[:n])
+    for ei, e in enumerate(edges):
+        u = node_to_idx[e["u"]]; v = node_to_idx[e["v"]]
+        # both directions point at the same edge index
+        for a, b in ((u, v), (v, u)):
+            k = cursor[a]
+            indices[k] = b
+            edge_idx[k] = ei
+            cursor[a] += 1
+
+    dist = array("d", [float(e.get("distance_m", 1.0)) for e in edges])
+    return {
+        "node_to_idx": node_to_idx,
+        "idx_to_node": idx_to_node,
+        "indptr": indptr,
+        "indices": indices,
+        "edge_idx": edge_idx,
+        "edge_list": list(edges),
+        "columns": {"distance_m": dist},
+        "weights": dist,
+        "eid_to_idx": {e["id"]: ei for ei, e in enumerate(edges)},
+    }
+
 # quick debug
 if __name__ == "__main__":
     nodes, edges, adj = build_graph()
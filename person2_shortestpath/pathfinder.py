@@ -1,100 +1,432 @@
 import heapq
-import copy
-from typing import Dict,List,Tuple,Optional
-
-# This is a helper function to get edge objects by their ID
-# It's a bit slow but easier than passing the full list around
-def _build_edge_lookup(adj:Dict[str,List[Tuple[str,dict]]])->Dict[str, dict]:
-    lookup={}
-    for u,nbrs in adj.items():
-        for v,e in nbrs:
-            eid=e.get("id")
-            if eid and eid not in lookup:
-                lookup[eid]=e
-    return lookup
+import itertools
+import importlib.util
+from array import array
+from typing import Dict,List,Tuple,Optional,Sequence
+from graph_loader import build_csr
+
+# numpy and numba are optional, and only imported once a graph is big
+# enough to need them (importing numba takes longer than a whole session
+# on the 16 edge dataset). np stays None until _load_numpy()
+HAVE_NUMPY = importlib.util.find_spec("numpy") is not None
+HAVE_NUMBA = HAVE_NUMPY and importlib.util.find_spec("numba") is not None
+np = None
+
+# below these sizes the plain python loops are faster, once the import
+# and compile time is counted in
+NUMPY_MIN_EDGES = 20000 # composite_weights
+NUMBA_MIN_NODES = 5000  # the compiled dijkstra
+
+def _load_numpy():
+    global np
+    if np is None:
+        import numpy as np
+    return np
 
 def dijkstra(adj:Dict[str,List[Tuple[str,dict]]],
              start:str,
              end:str,
-             weight_map:Dict[str,float])->Tuple[Optional[List[str]],float,List[dict]]:
-    
-    dist={n:float("inf")for n in adj.keys()}
-    prev_node={}   
-    prev_edge={}  
-    dist[start]=0.0
-    pq=[(0.0,start)] # priority queue
-    visited=set()
-    
+             weight_map:Dict[str,float],
+             blocked_eids=frozenset(),
+             blocked_nodes=frozenset())->Tuple[Optional[List[str]],float,List[dict]]:
+    # runs on an int indexed CSR version of adj (built fresh each call, so
+    # edits to adj always show up), the loop indexes flat arrays instead of dicts
+    # blocked_eids / blocked_nodes are just skipped, so callers (like Yen)
+    # dont have to make a modified copy of the graph
+    csr=_adj_to_csr(adj)
+    return dijkstra_csr(csr,start,end,edge_weights(csr,weight_map),blocked_eids,blocked_nodes)
+
+
+def _adj_to_csr(adj: Dict[str, List[Tuple[str, dict]]]) -> dict:
+    # collect every edge once (adj lists both directions) and let
+    # graph_loader.build_csr pack it, so theres only one CSR builder
+    edges = []
+    seen = set()
+    for nbrs in adj.values():
+        for _, e in nbrs:
+            if id(e) not in seen:
+                seen.add(id(e))
+                edges.append(e)
+    return build_csr(adj.keys(), edges)
+
+def edge_weights(csr: dict, weight_map: Optional[Dict[str, float]] = None) -> array:
+    # turn an edge_id -> weight dict into one weight per edge (indexed by
+    # edge_idx), so each edge is looked up once and not once per direction
+    # no weight_map means distance_m
+    edges = csr["edge_list"]
+    if weight_map is None:
+        return array("d", [float(e.get("distance_m", 1.0)) for e in edges])
+    inf = float("inf")
+    return array("d", [weight_map.get(e["id"], inf) for e in edges])
+
+def add_weight_column(csr: dict, name: str, weight_map: Dict[str, float]) -> array:
+    # store a per-edge weight column (e.g. "safety") on the CSR graph so
+    # composite_weights can mix it with the others
+    col = edge_weights(csr, weight_map)
+    csr["columns"][name] = col
+    return col
+
+def composite_weights(csr: dict, coeffs: Dict[str, float]) -> array:
+    """
+    Mixes the per-edge columns in csr["columns"] into one weight array,
+    e.g. {"safety": 1.0, "dist_norm": 1.0}. Switching objective is one pass
+    over the edges instead of building a new weight map for the graph.
+    """
+    names = [name for name, c in coeffs.items() if c]
+    if not names:
+        return array("d", [0.0]) * len(csr["edge_list"])
+    cs = [coeffs[name] for name in names]
+    cols = [csr["columns"][name] for name in names]
+    if HAVE_NUMPY and len(csr["edge_list"]) >= NUMPY_MIN_EDGES:
+        # whole columns at a time, added in the same order as sum() below
+        # so the floats come out the same
+        # (inf - inf gives nan quietly there too)
+        _load_numpy()
+        total = np.zeros(len(csr["edge_list"]))
+        with np.errstate(invalid="ignore"):
+            for c, col in zip(cs, cols):
+                total += c * np.asarray(col, dtype=np.float64)
+        return array("d", total.tobytes())
+    return array("d", [sum([c * x for c, x in zip(cs, row)]) for row in zip(*cols)])
+
+def _dijkstra_csr_py(indptr, indices, edge_idx, weights, skip_node, skip_edge, h, src, dst, n):
+    # plain python version of the CSR relaxation loop
+    # h[v] is a lower bound on the cost from v to dst, used as the A*
+    # heuristic (all zeros = normal dijkstra). dst=-1 means no target,
+    # so the whole shortest path tree gets built
+    # returns (dist, prev_node, prev_slot), all indexed by node index
+    dist = [float("inf")] * n
+    prev_node = [-1] * n
+    prev_slot = [-1] * n  # slot we came in on, gives us the edge
+    visited = [False] * n
+    dist[src] = 0.0
+    pq = [(h[src], src)]
+    push = heapq.heappush; pop = heapq.heappop
+
     while pq:
-        d_u,u=heapq.heappop(pq)
-        
-        
-        
-        if u in visited:
+        _, u = pop(pq)
+        if visited[u]:
             continue
-        visited.add(u)
-        
-        if u==end:
-            
-            break # Found
-            
-        for v,e in adj.get(u,[]):
-            eid=e["id"]
-            w=weight_map.get(eid,float("inf"))
-            alt=d_u+w
-            
-            if alt<dist.get(v,float("inf")):
-                
-                dist[v]=alt
-                prev_node[v]=u
-                prev_edge[v]=eid
-                heapq.heappush(pq,(alt,v))
-                
-    if dist.get(end,float("inf"))==float("inf"):
-        return None,float("inf"),[] # No path
-        
-    # --- Reconstruct the path -------------------------------------------
-    node_path=[]
-    edge_list=[]
-    cur=end
-    while True:
-        node_path.append(cur)
-        if cur==start:
+        visited[u] = True
+        if u == dst:
             break
-        eid=prev_edge.get(cur)
-        if eid is None:
-            # should not happen if the path already exists
-            print("ERROR: Path reconstruction failed!")
+        d_u = dist[u]
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            ei = edge_idx[k]
+            if skip_edge[ei] or skip_node[v]:
+                continue
+            alt = d_u + weights[ei]
+            if alt < dist[v]:
+                dist[v] = alt
+                prev_node[v] = u
+                prev_slot[v] = k
+                push(pq, (alt + h[v], v))
+    return dist, prev_node, prev_slot
+
+def _dijkstra_csr_kernel(indptr, indices, edge_idx, weights, skip_node, skip_edge, h, src, dst, n):
+    # same loop as _dijkstra_csr_py but with a hand written 4-ary heap
+    # over two parallel arrays (cost + h, node), since heapq cant be
+    # jitted. heap_pos[v] is where v sits in the heap (-1 = not in it),
+    # so a cheaper path just moves v up instead of pushing it again
+    # (only ever run through _numba_kernel)
+    dist = np.full(n, np.inf)
+    prev_node = np.full(n, -1, np.int64)
+    prev_slot = np.full(n, -1, np.int64)
+    visited = np.zeros(n, np.bool_)
+    # a node is never in the heap twice at the same time
+    heap_cost = np.empty(n, np.float64)
+    heap_node = np.empty(n, np.int64)
+    heap_pos = np.full(n, -1, np.int64)
+    dist[src] = 0.0
+    heap_cost[0] = h[src]
+    heap_node[0] = src
+    heap_pos[src] = 0
+    size = 1
+
+    while size > 0:
+        u = heap_node[0]
+        heap_pos[u] = -1
+        size -= 1
+        if size > 0:
+            # move the last entry to the root and sift it down
+            c = heap_cost[size]
+            x = heap_node[size]
+            i = 0
+            while True:
+                first = 4 * i + 1
+                if first >= size:
+                    break
+                m = first
+                last = min(first + 4, size)
+                for j in range(first + 1, last):
+                    if heap_cost[j] < heap_cost[m]:
+                        m = j
+                if heap_cost[m] < c:
+                    heap_cost[i] = heap_cost[m]
+                    heap_node[i] = heap_node[m]
+                    heap_pos[heap_node[i]] = i
+                    i = m
+                else:
+                    break
+            heap_cost[i] = c
+            heap_node[i] = x
+            heap_pos[x] = i
+
+        if visited[u]:
+            continue
+        visited[u] = True
+        if u == dst:
             break
-        
-        cur=prev_node[cur]
-        
+
+        d_u = dist[u]
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            ei = edge_idx[k]
+            if skip_edge[ei] or skip_node[v]:
+                continue
+            alt = d_u + weights[ei]
+            if alt < dist[v]:
+                dist[v] = alt
+                prev_node[v] = u
+                prev_slot[v] = k
+                # insert v, or decrease its key if its already in,
+                # then sift up
+                f = alt + h[v]
+                i = heap_pos[v]
+                if i == -1:
+                    i = size
+                    size += 1
+                while i > 0:
+                    p = (i - 1) >> 2
+                    if heap_cost[p] > f:
+                        heap_cost[i] = heap_cost[p]
+                        heap_node[i] = heap_node[p]
+                        heap_pos[heap_node[i]] = i
+                        i = p
+                    else:
+                        break
+                heap_cost[i] = f
+                heap_node[i] = v
+                heap_pos[v] = i
+    return dist, prev_node, prev_slot
+
+class MutationStack:
+    """
+    Temporary node removals on a CSR graph, kept as a flag array instead
+    of editing the graph. restore_all() undoes them (in reverse order).
+    Pass it to dijkstra_csr(mask=...).
+    """
+    def __init__(self, csr: dict):
+        self.csr = csr
+        self.skip_node = bytearray(len(csr["idx_to_node"]))
+        self._log = [] # (index, old value)
+
+    def remove_node(self, nid: str):
+        i = self.csr["node_to_idx"][nid]
+        self._log.append((i, self.skip_node[i]))
+        self.skip_node[i] = 1
+
+    def restore_all(self):
+        while self._log:
+            i, old = self._log.pop()
+            self.skip_node[i] = old
+
+def _csr_run(csr, src, dst, weights, skip_node, skip_edge, h=None):
+    # picks the numba kernel or the python loop, returns the raw
+    # (dist, prev_node, prev_slot) arrays
+    indptr = csr["indptr"]; indices = csr["indices"]; edge_idx = csr["edge_idx"]
+    n = len(csr["idx_to_node"])
+    if h is None:
+        h = array("d", [0.0]) * n
+    if HAVE_NUMBA and n >= NUMBA_MIN_NODES:
+        kernel = _numba_kernel() # imports numpy too
+        return kernel(
+            np.frombuffer(indptr, dtype=np.int32),
+            np.frombuffer(indices, dtype=np.int32),
+            np.frombuffer(edge_idx, dtype=np.int32),
+            np.frombuffer(weights, dtype=np.float64),
+            np.frombuffer(skip_node, dtype=np.uint8),
+            np.frombuffer(skip_edge, dtype=np.uint8),
+            np.frombuffer(h, dtype=np.float64),
+            src, dst, n)
+    return _dijkstra_csr_py(indptr, indices, edge_idx, weights, skip_node, skip_edge, h, src, dst, n)
+
+_KERNEL = None
+
+def _numba_kernel():
+    # numba version of _dijkstra_csr_kernel, imported + compiled (or
+    # loaded from numba's cache) the first time a big graph is searched
+    global _KERNEL
+    if _KERNEL is None:
+        _load_numpy()
+        from numba import njit
+        _KERNEL = njit(cache=True)(_dijkstra_csr_kernel)
+    return _KERNEL
+
+def warmup(csr: dict) -> None:
+    # if csr is big enough for the compiled search, get numba's compile
+    # (or loading it from its cache) done now and not on the first query
+    n = len(csr["idx_to_node"])
+    if not HAVE_NUMBA or n < NUMBA_MIN_NODES:
+        return
+    _csr_run(csr, 0, -1, csr["weights"], bytearray(n), bytearray(len(csr["edge_list"])))
+
+def _csr_search(csr, src, dst, weights, blocked_edges=(), blocked_nodes=(), mask=None, h=None):
+    # dijkstra (or A* if h is given) on the CSR arrays, all in int indices
+    # blocked_edges are edge indices, blocked_nodes are node indices,
+    # mask is an optional MutationStack with more removed nodes
+    # returns (node_idx_path, cost, edge_idx_path) or (None, inf, [])
+    skip_node, skip_edge = _skip_flags(csr, blocked_edges, blocked_nodes, mask)
+
+    # nothing to search for in these two cases
+    if src == dst:
+        return [src], 0.0, []
+    if skip_node[dst]:
+        return None, float("inf"), []
+
+    dist, prev_node, prev_slot = _csr_run(csr, src, dst, weights, skip_node, skip_edge, h)
+    return _csr_path(csr, src, dst, dist, prev_node, prev_slot)
+
+def _skip_flags(csr, blocked_edges=(), blocked_nodes=(), mask=None):
+    # turn the blocked sets into flags the loop can index directly
+    skip_edge = bytearray(len(csr["edge_list"]))
+    if mask is None:
+        skip_node = bytearray(len(csr["idx_to_node"]))
+    else:
+        skip_node = bytearray(mask.skip_node)
+    for b in blocked_nodes:
+        skip_node[b] = 1
+    for b in blocked_edges:
+        skip_edge[b] = 1
+    return skip_node, skip_edge
+
+def _csr_path(csr, src, dst, dist, prev_node, prev_slot):
+    # follow prev back from dst, gives (node_idx_path, cost, edge_idx_path)
+    edge_idx = csr["edge_idx"]
+    if dist[dst] == float("inf"):
+        return None, float("inf"), []
+
+    node_path = [dst]
+    edge_path = []
+    cur = dst
+    while cur != src:
+        edge_path.append(edge_idx[prev_slot[cur]])
+        cur = int(prev_node[cur])
+        node_path.append(cur)
     node_path.reverse()
-    
-    # build edge_list by walking the node_path
-    edge_lookup = _build_edge_lookup(adj)
-    for i in range(len(node_path)-1):
-        u = node_path[i]; v = node_path[i+1]
-        
-        eid = prev_edge.get(v) # get the edge id we saved
-        edge_obj = None
-        if eid and eid in edge_lookup:
-            edge_obj = edge_lookup[eid]
+    edge_path.reverse()
+    return node_path, float(dist[dst]), edge_path
+
+def dijkstra_csr(csr: dict,
+                 start: str,
+                 end: str,
+                 weights: Optional[array] = None,
+                 blocked_eids=frozenset(),
+                 blocked_nodes=frozenset(),
+                 mask: Optional[MutationStack] = None) -> Tuple[Optional[List[str]], float, List[dict]]:
+    """
+    Same as dijkstra() but runs on the CSR arrays from graph_loader.build_csr.
+    weights has one entry per edge (see edge_weights), defaults to distance.
+    Edges in blocked_eids and nodes in blocked_nodes are skipped, and so is
+    anything removed through mask.
+    Returns (node_path, cost, edge_list) with node ids, like dijkstra().
+    """
+    node_to_idx = csr["node_to_idx"]; eid_to_idx = csr["eid_to_idx"]
+    if start not in node_to_idx or end not in node_to_idx:
+        return None, float("inf"), []
+    if weights is None:
+        weights = csr["weights"]
+
+    node_path, cost, edge_path = _csr_search(
+        csr, node_to_idx[start], node_to_idx[end], weights,
+        [eid_to_idx[eid] for eid in blocked_eids if eid in eid_to_idx],
+        [node_to_idx[nid] for nid in blocked_nodes if nid in node_to_idx],
+        mask)
+    if node_path is None:
+        return None, float("inf"), []
+    idx_to_node = csr["idx_to_node"]; edge_list = csr["edge_list"]
+    return [idx_to_node[i] for i in node_path], cost, [edge_list[ei] for ei in edge_path]
+
+def dijkstra_multi_csr(csr: dict,
+                       start: str,
+                       end: str,
+                       weights_list: Sequence[array],
+                       blocked_eids=frozenset(),
+                       blocked_nodes=frozenset(),
+                       mask: Optional[MutationStack] = None) -> List[Tuple[Optional[List[str]], float, List[dict]]]:
+    """
+    dijkstra_csr for several objectives (weight arrays) between the same
+    two nodes, e.g. [distance, safety]. The id lookups and the blocked
+    flags are worked out once and shared by all the searches.
+    Returns one (node_path, cost, edge_list) per weight array.
+    """
+    node_to_idx = csr["node_to_idx"]; eid_to_idx = csr["eid_to_idx"]
+    if start not in node_to_idx or end not in node_to_idx:
+        return [(None, float("inf"), []) for _ in weights_list]
+    src = node_to_idx[start]; dst = node_to_idx[end]
+    skip_node, skip_edge = _skip_flags(
+        csr,
+        [eid_to_idx[eid] for eid in blocked_eids if eid in eid_to_idx],
+        [node_to_idx[nid] for nid in blocked_nodes if nid in node_to_idx],
+        mask)
+
+    idx_to_node = csr["idx_to_node"]; edge_list = csr["edge_list"]
+    out = []
+    for weights in weights_list:
+        if src == dst:
+            out.append(([start], 0.0, []))
+            continue
+        if skip_node[dst]:
+            out.append((None, float("inf"), []))
+            continue
+        dist, prev_node, prev_slot = _csr_run(csr, src, dst, weights, skip_node, skip_edge)
+        node_path, cost, edge_path = _csr_path(csr, src, dst, dist, prev_node, prev_slot)
+        if node_path is None:
+            out.append((None, float("inf"), []))
         else:
-            # fallback: find any edge in adj[u] that goes to v
-            # this is just in case, shudn't be needed
-            for (nbr, e) in adj.get(u, []):
-                if nbr == v:
-                    edge_obj = e
-                    break
-                    
-        if edge_obj is None:
-            continue # weird but we can skip ig
-            
-        edge_list.append(edge_obj)
+            out.append(([idx_to_node[i] for i in node_path], cost, [edge_list[ei] for ei in edge_path]))
+    return out
 
-    total_cost = dist.get(end, float("inf"))
-    return node_path, total_cost, edge_list
+def _leg_search(csr, a, b, weights, skip_node, skip_edge):
+    # one a -> b search with the flags already set up, as
+    # (node_path, cost, edge_list), node_path is None if theres no path
+    node_to_idx = csr["node_to_idx"]
+    if a not in node_to_idx or b not in node_to_idx:
+        return (None, float("inf"), [])
+    src = node_to_idx[a]; dst = node_to_idx[b]
+    if src == dst:
+        return ([a], 0.0, [])
+    if skip_node[dst]:
+        return (None, float("inf"), [])
+    dist, prev_node, prev_slot = _csr_run(csr, src, dst, weights, skip_node, skip_edge)
+    node_path, cost, edge_path = _csr_path(csr, src, dst, dist, prev_node, prev_slot)
+    if node_path is None:
+        return (None, float("inf"), [])
+    idx_to_node = csr["idx_to_node"]; edge_list = csr["edge_list"]
+    return ([idx_to_node[i] for i in node_path], cost, [edge_list[ei] for ei in edge_path])
+
+def dijkstra_pairs_csr(csr: dict,
+                       pairs: Sequence[Tuple[str, str]],
+                       weights: Optional[array] = None,
+                       blocked_eids=frozenset(),
+                       blocked_nodes=frozenset(),
+                       mask: Optional[MutationStack] = None) -> List[Tuple[Optional[List[str]], float, List[dict]]]:
+    """
+    dijkstra_csr for a list of independent (start, end) pairs, e.g. the
+    legs of a must-pass route that arent known yet. The blocked flags are
+    worked out once for all of them. Returns one (node_path, cost,
+    edge_list) per pair, in order.
+    """
+    node_to_idx = csr["node_to_idx"]; eid_to_idx = csr["eid_to_idx"]
+    if weights is None:
+        weights = csr["weights"]
+    skip_node, skip_edge = _skip_flags(
+        csr,
+        [eid_to_idx[eid] for eid in blocked_eids if eid in eid_to_idx],
+        [node_to_idx[nid] for nid in blocked_nodes if nid in node_to_idx],
+        mask)
+    return [_leg_search(csr, a, b, weights, skip_node, skip_edge) for a, b in pairs]
 
 
 def yen_k_shortest(adj: Dict[str, List[Tuple[str, dict]]],
@@ -106,42 +438,144 @@ def yen_k_shortest(adj: Dict[str, List[Tuple[str, dict]]],
     Simplified Yen's algorithm. This was hard.
     Returns up to K simple paths as (node_path, cost, edge_list).
     """
-    A: List[Tuple[List[str], float, List[dict]]] = [] # A  results
-    B: List[Tuple[List[str], float, List[dict]]] = [] # B  candidates
+    # flatten the graph once, every spur search reuses the same arrays
+    csr = _adj_to_csr(adj)
+    if start not in csr["node_to_idx"] or end not in csr["node_to_idx"]:
+        return []
+    return yen_k_shortest_csr(csr, start, end, edge_weights(csr, weight_map), K)
+
+def yen_k_shortest_csr(csr: dict,
+                       start: str,
+                       end: str,
+                       weights: Optional[array] = None,
+                       K: int = 3,
+                       blocked_nodes=frozenset(),
+                       mask: Optional[MutationStack] = None) -> List[Tuple[List[str], float, List[dict]]]:
+    """
+    Same as yen_k_shortest() but on the CSR arrays from graph_loader.build_csr,
+    with one weight per edge (see edge_weights / composite_weights).
+    Nodes in blocked_nodes, and anything removed through mask, are left
+    out of every path.
+    """
+    # everything below works on int node / edge indices, and only the
+    # final paths are turned back into ids and edge dicts
+    node_to_idx = csr["node_to_idx"]; edge_list = csr["edge_list"]
+    if start not in node_to_idx or end not in node_to_idx:
+        return []
+    edge_w = csr["weights"] if weights is None else weights
+    src = node_to_idx[start]; dst = node_to_idx[end]
+    csr_edge_idx = csr["edge_idx"]
+
+    # nodes / edges that are off limits for the whole search (e.g. the avoid list)
+    base_blocked = [node_to_idx[nid] for nid in blocked_nodes if nid in node_to_idx]
+    base_skip, base_skip_edge = _skip_flags(csr, (), base_blocked, mask)
+    if base_skip[src] or base_skip[dst]:
+        return []
+
+    A: List[Tuple[List[int], float, List[int]]] = [] # A  results
+    # B  candidates, kept as a heap of (cost, seq, candidate, spur index).
+    # seq keeps equal-cost candidates in the order they were found
+    B_heap: List[Tuple[float, int, Tuple[List[int], float, List[int]], int]] = []
+    B_seen = set() # edge sequences already put in B
+    seq = itertools.count()
+
+    # root prefix (tuple of edges) -> edges each path in A takes right
+    # after that prefix, so a spur can look up what to block. edges not
+    # nodes, with parallel edges two roots can visit the same nodes
+    prefix_map: Dict[tuple, set] = {}
+
+    # (root, blocked edges) of every spur search already run
+    spur_done = set()
+
+    push = heapq.heappush; B_seen_add = B_seen.add; spur_done_add = spur_done.add
+
+    # A_dev[k] = index where A[k] branched off the path it was spurred
+    # from. spurs before that were already covered by that path
+    A_dev: List[int] = []
+
+    def add_to_A(path, dev):
+        A.append(path); A_dev.append(dev)
+        p_edges = path[2]
+        for j in range(len(p_edges)):
+            prefix_map.setdefault(tuple(p_edges[:j]), set()).add(p_edges[j])
+
+    # one full dijkstra out from the end on the graph minus the base skips. its
+    # undirected, so dist_end[v] is the best cost from v to the end, and
+    # blocking stuff only ever makes that bigger -> safe A* bound for every
+    # spur search. the tree itself is often the spur path already
+    dist_end, next_node, next_slot = _csr_run(csr, dst, -1, edge_w, base_skip, base_skip_edge)
+    h = array("d", dist_end)
+    inf = float("inf")
+
+    def tree_path(s, blocked_edges, blocked_nodes):
+        # follow the tree from s to the end, None if it runs into something blocked
+        nodes = [s]; edges = []
+        cur = s
+        while cur != dst:
+            ei = csr_edge_idx[next_slot[cur]]
+            cur = int(next_node[cur])
+            if ei in blocked_edges or cur in blocked_nodes:
+                return None
+            nodes.append(cur); edges.append(ei)
+        return nodes, h[s], edges
 
     # Get the first shortest path (k=1)
-    first = dijkstra(adj, start, end, weight_map)
-    if first[0] is None:
+    if h[src] == inf:
         return [] # No paths at all
-    A.append(first)
+    add_to_A(tree_path(src, (), ()), 0)
 
     for k in range(1, K):
         # Get the previous (k-1) shortest path
         prev_path_nodes, prev_cost, prev_edges = A[k-1]
 
         # Iterate over each node in the (k-1) path
-        for i in range(len(prev_path_nodes) - 1):
+        # only spur from the branch point on (Lawler), the earlier roots
+        # are shared with the parent path and were spurred from there
+        for i in range(A_dev[k-1], len(prev_path_nodes) - 1):
             spur_node = prev_path_nodes[i]
             root_path = prev_path_nodes[:i+1] 
 
-            # Make a copy of the graph to mess with
-            adj_cp = {n: [(v, copy.deepcopy(e)) for (v, e) in nbrs] for n, nbrs in adj.items()}
+            # edges that would recreate previous paths (the *next* edge of
+            # every path in A that shares this root) get blocked
+            root_key = tuple(prev_edges[:i])
+            blocked_edges = prefix_map.get(root_key, ())
 
-            # remove edges that would recreate previous paths
-            for (p_nodes, p_cost, p_edges) in A:
-                if len(p_nodes) > i and p_nodes[:i+1] == root_path:
-                    # remove the *next* edge in the path
-                    u = p_nodes[i]; v = p_nodes[i+1]; eid_block = p_edges[i]["id"]
-                    adj_cp[u] = [(vv, ee) for (vv, ee) in adj_cp.get(u, []) if not (vv == v and ee["id"] == eid_block)]
-                    adj_cp[v] = [(vv, ee) for (vv, ee) in adj_cp.get(v, []) if not (vv == u and ee["id"] == eid_block)]
+            # same root + same blocked edges = same candidate as an earlier
+            # spur, and thats already in B (or A), so dont run it again
+            spur_key = (root_key, frozenset(blocked_edges))
+            if spur_key in spur_done:
+                continue
+            spur_done_add(spur_key)
 
-            
-            removed_nodes = set(root_path[:-1])
-            for rn in removed_nodes:
-                adj_cp[rn] = []
+            # and the root nodes too, so the spur cant loop back
+            root_nodes = set(root_path[:-1])
+
+            if h[spur_node] == inf:
+                continue # cant reach the end from here even with nothing blocked
 
-            # run dijkstra from the spur  to the end
-            spur_path_nodes, spur_cost, spur_edges = dijkstra(adj_cp, spur_node, end, weight_map)
+            # if the tree path from the spur dodges everything blocked its
+            # already the best, otherwise A* from the spur to the end
+            spur = tree_path(spur_node, blocked_edges, root_nodes)
+            if spur is None:
+                # the root nodes and blocked edges go onto the base flags
+                # just for this search and get cleared again after, so a
+                # spur only touches those few slots instead of copying the
+                # flags for the whole graph
+                new_nodes = [b for b in root_nodes if not base_skip[b]]
+                new_edges = [b for b in blocked_edges if not base_skip_edge[b]]
+                for b in new_nodes:
+                    base_skip[b] = 1
+                for b in new_edges:
+                    base_skip_edge[b] = 1
+                try:
+                    dist, prev_node, prev_slot = _csr_run(csr, spur_node, dst, edge_w, base_skip, base_skip_edge, h)
+                finally:
+                    for b in new_nodes:
+                        base_skip[b] = 0
+                    for b in new_edges:
+                        base_skip_edge[b] = 0
+                spur = _csr_path(csr, spur_node, dst, dist, prev_node, prev_slot)
+            spur_path_nodes, spur_cost, spur_edges = spur
             
             if spur_path_nodes is None:
                 continue # no path from here
@@ -156,22 +590,24 @@ def yen_k_shortest(adj: Dict[str, List[Tuple[str, dict]]],
             total_edges.extend(spur_edges)
 
             # recalculate total cost (just to be safe)
-            total_cost = 0.0
-            for e in total_edges:
-                total_cost += weight_map.get(e["id"], 0.0)
+            total_cost = sum([edge_w[ei] for ei in total_edges])
 
-            candidate = (total_nodes, total_cost, total_edges)
-            if candidate not in B:
-                B.append(candidate)
+            # the edges identify the path (parallel edges give different paths)
+            key = tuple(total_edges)
+            if key not in B_seen:
+                B_seen_add(key)
+                push(B_heap, (total_cost, next(seq), (total_nodes, total_cost, total_edges), i))
 
-        if not B:
+        if not B_heap:
             break # no more candidates found
             
-        # sort candidates by cost and add the best one to our results
-        B.sort(key=lambda x: x[1])
-        A.append(B.pop(0))
+        # add the cheapest candidate to our results
+        _, _, best, dev = heapq.heappop(B_heap)
+        add_to_A(best, dev)
 
-    return A
+    idx_to_node = csr["idx_to_node"]
+    return [([idx_to_node[i] for i in p_nodes], cost, [edge_list[ei] for ei in p_edges])
+            for (p_nodes, cost, p_edges) in A]
 
 
 def distance_map(adj: Dict[str, List[Tuple[str, dict]]]) -> Dict[str, float]:
@@ -186,3 +622,24 @@ def summarize_route(edges: List[dict]) -> dict:
     # Not used by main.py, but cud be useful ig
     total = sum(float(e.get("distance_m", 0.0)) for e in edges)
     return {"distance_m": int(total), "n_edges": len(edges)}
+
+# quick check: Yen on a graph with parallel edges (two roads between the
+# same places), against every simple path worked out by hand. the old
+# node-based blocking only ever found 3 of the 4 paths here.
+# run with: python pathfinder.py (person1_dataset on PYTHONPATH)
+if __name__ == "__main__":
+    edges = [{"id": "A-B-1", "u": "B", "v": "A", "distance_m": 4.0},
+             {"id": "A-B-2", "u": "A", "v": "B", "distance_m": 7.0},
+             {"id": "B-C-1", "u": "B", "v": "C", "distance_m": 7.0},
+             {"id": "B-C-2", "u": "B", "v": "C", "distance_m": 5.0}]
+    csr = build_csr(["A", "B", "C"], edges)
+
+    # all simple A -> C paths, cheapest first (no two cost the same)
+    expected = [(["A-B-1", "B-C-2"], 9.0),
+                (["A-B-1", "B-C-1"], 11.0),
+                (["A-B-2", "B-C-2"], 12.0),
+                (["A-B-2", "B-C-1"], 14.0)]
+    for K in range(1, 6):
+        got = [([e["id"] for e in p_edges], cost) for _, cost, p_edges in yen_k_shortest_csr(csr, "A", "C", K=K)]
+        assert got == expected[:K], (K, got)
+    print("yen parallel edges ok")
@@ -1,8 +1,25 @@
 # safety_scoring.py
 # Phase 3: Weight Calculation
 
-from typing import Tuple, Dict
-import copy
+import importlib.util
+from typing import Tuple, Dict, List
+
+# numpy (and numba for the bulk scoring loop) are optional, and only
+# imported once compute_edge_weights_bulk gets enough edges to need them.
+# np stays None until _load_numpy()
+HAVE_NUMPY = importlib.util.find_spec("numpy") is not None
+HAVE_NUMBA = HAVE_NUMPY and importlib.util.find_spec("numba") is not None
+np = None
+
+# below these edge counts the import (+ compile) costs more than it saves
+NUMPY_MIN_EDGES = 5000
+NUMBA_MIN_EDGES = 1000000
+
+def _load_numpy():
+    global np
+    if np is None:
+        import numpy as np
+    return np
 
 # Set some max values for normalization
 DIST_CAP = 2000.0
@@ -20,15 +37,17 @@ def clamp01(x: float) -> float:
         return 0.0 # if it's not a number, just return 0
 
 
+# risk for each crowd bucket: too empty, just right, a bit crowded, too crowded
+_CROWD_TABLE = (1.0, 0.2, 0.5, 0.7)
+
 def _u_shaped_crowd(crowd01: float) -> float:
     # U-shaped risk for crowds (0..1, higher is worse)
     # 0.2 (empty) -> 1.0 (bad)
     # 0.5 (medium) -> 0.2 (good)
     # 0.9 (full) -> 0.7 (bad)
-    if crowd01 < 0.2: return 1.0 # too empty
-    if crowd01 < 0.5: return 0.2 # just right
-    if crowd01 < 0.8: return 0.5 # a bit crowded
-    return 0.7 # too crowded
+    # the bucket is just how many of the cut-offs we're past. "not <" and
+    # not ">=" so nan ends up in the last bucket, like the old if-ladder
+    return _CROWD_TABLE[(not crowd01 < 0.2) + (not crowd01 < 0.5) + (not crowd01 < 0.8)]
 
 # These are the magic nos for scoring
 # mode coefficients (presets)
@@ -64,12 +83,28 @@ TIME_MULTS = {
 
 def _to01(val, scale=10.0) -> float:
     # convert a 0-10 score to 0-1
+    # (clamp01 inlined, this runs ~10 times per edge)
     try:
-        return clamp01(float(val) / float(scale))
+        v = float(val) / scale
     except Exception:
         return 0.0
+    if v < 0.0:
+        return 0.0
+    if v > 1.0:
+        return 1.0
+    return v
+
+# mode string -> mode key, so the same few strings dont get lowercased
+# and checked for every edge
+_MODE_KEY_CACHE: Dict[str, str] = {}
 
 def _get_mode_key(mode: str) -> str:
+    key = _MODE_KEY_CACHE.get(mode)
+    if key is None:
+        key = _MODE_KEY_CACHE[mode] = _resolve_mode_key(mode)
+    return key
+
+def _resolve_mode_key(mode: str) -> str:
     # make sure mode is one of the 3 keys
     m = (mode or "walking").lower()
     if m in ("car","two_wheeler","walking"):
@@ -78,83 +113,162 @@ def _get_mode_key(mode: str) -> str:
     if m in ("bike","bicycle","two-wheeler"): return "two_wheeler"
     return "walking" # default
 
-def compute_edge_weight(edge: dict, mode: str, time_of_day: str, custom_weights: Dict[str, float]=None) -> Tuple[float, Dict]:
+def _get_time_slot(time_of_day: str) -> str:
+    return time_of_day if time_of_day in TIME_MULTS else ("night" if time_of_day=="night" else "day")
 
-    mode_key = _get_mode_key(mode)
-    time_slot = time_of_day if time_of_day in TIME_MULTS else ("night" if time_of_day=="night" else "day")
+# risk features in the order they get added up
+FEATS = ("crime", "lighting", "cctv", "crowd_density", "traffic_density",
+         "accidents_reported", "road_condition", "stray_animals", "nearest_police_m",
+         "sidewalk", "shops_visibility", "traffic_behavior", "parking_safety")
 
-    # copy coeffs so we don't modify global presets
-    coeffs = copy.deepcopy(MODE_PRESETS[mode_key])
+def _mode_coeffs(mode_key: str, custom_weights: Dict[str, float]=None) -> Dict[str, float]:
+    # no overrides -> the preset itself (read-only, dont modify it)
+    if not custom_weights:
+        return MODE_PRESETS[mode_key]
+
+    # shallow copy is enough, its all floats. dont modify global presets
+    coeffs = dict(MODE_PRESETS[mode_key])
 
     # apply custom weights from user
-    if custom_weights:
-        for k, v in custom_weights.items():
-            try:
-                if isinstance(v, (list, tuple)) and len(v) == 2 and str(v[0]).lower() == "mul":
-                    # this handles the ("mul", 1.5) case, which is a bit complex but leaving it
-                    coeffs[k] = coeffs.get(k, 0.0) * float(v[1])
-                else:
-                    # this just overwrites the base coefficient
-                    coeffs[k] = float(v)
-            except Exception:
-                # ignore malformed override entries
-                pass
-
-    # distance normalisation
-    dist_m = float(edge.get("distance_m", 0.0))
-    dist01 = clamp01(dist_m / DIST_CAP)
-
-    # get attribute block safely
-    block = {}
+    for k, v in custom_weights.items():
+        try:
+            if isinstance(v, (list, tuple)) and len(v) == 2 and str(v[0]).lower() == "mul":
+                # this handles the ("mul", 1.5) case, which is a bit complex but leaving it
+                coeffs[k] = coeffs.get(k, 0.0) * float(v[1])
+            else:
+                # this just overwrites the base coefficient
+                coeffs[k] = float(v)
+        except Exception:
+            # ignore malformed override entries
+            pass
+    return coeffs
+
+# features that get a day/night multiplier
+TIME_FEATS = ("crime", "lighting", "traffic_density")
+
+def _coeff_vectors(coeffs: Dict[str, float], tms: Dict[str, float]) -> Tuple[Tuple[float, ...], Tuple[float, ...]]:
+    # coefficient and time multiplier of every feature, in FEATS order
+    return (tuple(coeffs.get(f, 0.0) for f in FEATS),
+            tuple(tms.get(f, 1.0) if f in TIME_FEATS else 1.0 for f in FEATS))
+
+# (mode_key, time_slot) -> _coeff_vectors of the preset. these never
+# change, so theres no need to look them up per edge
+FEAT_COEFFS = {(m, t): _coeff_vectors(MODE_PRESETS[m], TIME_MULTS[t])
+               for m in MODE_PRESETS for t in TIME_MULTS}
+
+def _feat_coeffs(mode_key: str, time_slot: str, custom_weights: Dict[str, float]=None):
+    if not custom_weights:
+        return FEAT_COEFFS[(mode_key, time_slot)]
+    return _coeff_vectors(_mode_coeffs(mode_key, custom_weights), TIME_MULTS[time_slot])
+
+# shared empty attribute block, never written to
+EMPTY: Dict = {}
+
+def _attr_block(edge: dict, mode_key: str, time_slot: str) -> dict:
+    # get attribute block, the normal case is just the one lookup chain.
+    # missing levels or anything thats not a dict counts as empty
     try:
-        block = edge.get("modes", {}).get(mode_key, {}).get(time_slot, {})
-    except Exception:
-        block = {} # just use empty if anything goes wrong
-
-    # get all attributes from the JSON data, default to 0
-    crime = _to01(block.get("crime", 0))
-    lighting = _to01(block.get("lighting", 0))
-    cctv = 1.0 if block.get("cctv", 0) else 0.0 # 1 or 0
-    crowd = _to01(block.get("crowd_density", block.get("crowd", 0)))
-    traffic = _to01(block.get("traffic_density", 0))
-    accidents = _to01(block.get("accidents_reported", 0))
-    road_cond = _to01(block.get("road_condition", 0))
-    # handle typos in data
-    stray = _to01(block.get("stray_animals", block.get("stray_animice", 0))) 
-    nearest_police = float(block.get("nearest_police_m", edge.get("nearest_police_m", POLICE_CAP)))
-    sidewalk = 1.0 if block.get("sidewalk", 0) else 0.0 # 1 or 0
-    shops = _to01(block.get("shops_visibility", 0))
-    traffic_behavior = _to01(block.get("traffic_behavior", 0))
-    parking_safety = _to01(block.get("parking_safety", 0))
-
-    # convert to risk metrics (0..1 where higher = worse)
+        block = edge["modes"][mode_key][time_slot]
+    except (KeyError, TypeError, IndexError):
+        return EMPTY
+    if not isinstance(block, dict):
+        return EMPTY
+    return block
+
+def _raw_attrs(edge: dict, mode_key: str, time_slot: str) -> tuple:
+    # the attributes of one edge for this mode + time, not normalised yet
+    # (no float() or _to01 per value), see _edge_attrs.
+    # cctv / sidewalk go by truthiness so they get done here
+    get = _attr_block(edge, mode_key, time_slot).get
+    return (edge.get("distance_m", 0.0),
+            get("crime", 0),
+            get("lighting", 0),
+            1.0 if get("cctv", 0) else 0.0, # 1 or 0
+            get("crowd_density", get("crowd", 0)),
+            get("traffic_density", 0),
+            get("accidents_reported", 0),
+            get("road_condition", 0),
+            get("stray_animals", get("stray_animice", 0)), # handle typos in data
+            get("nearest_police_m", edge.get("nearest_police_m", POLICE_CAP)),
+            1.0 if get("sidewalk", 0) else 0.0, # 1 or 0
+            get("shops_visibility", 0),
+            get("traffic_behavior", 0),
+            get("parking_safety", 0))
+
+# columns of _raw_attrs that are 0-10 scores (_to01)
+_SCORE_COLS = [1, 2, 4, 5, 6, 7, 8, 11, 12, 13]
+
+def _edge_attrs(edge: dict, mode_key: str, time_slot: str) -> Tuple[float, ...]:
+    # the raw (normalised) attributes of one edge for this mode + time
+    # compute_edge_weights_bulk does the same conversion on whole columns
+    # one conversion per column, the _SCORE_COLS ones go through _to01
+    (dist_m, crime, lighting, cctv, crowd, traffic, accidents, road_cond, stray,
+     nearest_police, sidewalk, shops, traffic_behavior, parking_safety) = _raw_attrs(edge, mode_key, time_slot)
+    return (clamp01(float(dist_m) / DIST_CAP), _to01(crime), _to01(lighting), cctv,
+            _to01(crowd), _to01(traffic), _to01(accidents), _to01(road_cond), _to01(stray),
+            float(nearest_police), sidewalk, _to01(shops), _to01(traffic_behavior), _to01(parking_safety))
+
+def _police_risk(nearest_police: float) -> float:
+    return 1.0 - clamp01(min(nearest_police, POLICE_CAP) / POLICE_CAP) # flip it
+
+def _risks_from_attrs(attrs, crowd_risk=_u_shaped_crowd, police_risk=_police_risk):
+    # convert to risk metrics (0..1 where higher = worse), in FEATS order
     # e.g. for lighting, 10/10 is good (0.0 risk), 0/10 is bad (1.0 risk)
-    risks = {
-        "crime": crime,
-        "lighting": 1.0 - lighting,
-        "cctv": 1.0 - cctv,
-        "crowd_density": _u_shaped_crowd(crowd),
-        "traffic_density": traffic,
-        "accidents_reported": accidents,
-        "road_condition": 1.0 - road_cond,
-        "stray_animals": stray,
-        "nearest_police_m": 1.0 - clamp01(min(nearest_police, POLICE_CAP) / POLICE_CAP), # flip it
-        "sidewalk": 1.0 - sidewalk,
-        "shops_visibility": 1.0 - shops,
-        "traffic_behavior": traffic_behavior,
-        "parking_safety": 1.0 - parking_safety
-    }
+    # works on one edge (floats) and on numpy columns (all edges), the bulk
+    # version just passes its own crowd / police functions
+    (dist01, crime, lighting, cctv, crowd, traffic, accidents, road_cond, stray,
+     nearest_police, sidewalk, shops, traffic_behavior, parking_safety) = attrs
+    risks = (
+        crime,
+        1.0 - lighting,
+        1.0 - cctv,
+        crowd_risk(crowd),
+        traffic,
+        accidents,
+        1.0 - road_cond,
+        stray,
+        police_risk(nearest_police),
+        1.0 - sidewalk,
+        1.0 - shops,
+        traffic_behavior,
+        1.0 - parking_safety
+    )
+    return risks, dist01
+
+def _edge_risks(edge: dict, mode_key: str, time_slot: str) -> Tuple[Tuple[float, ...], float]:
+    # risk of every feature in FEATS order, plus dist01 for the distance penalty
+    return _risks_from_attrs(_edge_attrs(edge, mode_key, time_slot))
 
-    tms = TIME_MULTS[time_slot]
+def _edge_weight(edge: dict, mode_key: str, time_slot: str, coeff_vec, tm_vec) -> float:
+    # just the weight, no breakdown dicts and no rounding, with the mode /
+    # time / coeffs already resolved (no-numpy bulk path). added up in the
+    # same order as edge_weight_breakdown so the floats match
+    risks, dist01 = _edge_risks(edge, mode_key, time_slot)
+    total = 0.0
+    for risk, coeff, tm in zip(risks, coeff_vec, tm_vec):
+        total += risk * coeff * tm
+    return total + 0.5 * dist01
+
+def resolve_coeffs(mode: str, time_of_day: str, custom_weights: Dict[str, float]=None) -> tuple:
+    # mode / time / overrides worked out into (mode_key, time_slot,
+    # coeff_vec, tm_vec) once, for scoring lots of edges one at a time
+    # without going through the overrides dict for every edge
+    mode_key = _get_mode_key(mode)
+    time_slot = _get_time_slot(time_of_day)
+    return (mode_key, time_slot) + _feat_coeffs(mode_key, time_slot, custom_weights)
+
+def compute_edge_weight(edge: dict, mode: str, time_of_day: str, custom_weights: Dict[str, float]=None) -> Tuple[float, Dict]:
+    return edge_weight_breakdown(edge, resolve_coeffs(mode, time_of_day, custom_weights))
+
+def edge_weight_breakdown(edge: dict, resolved: tuple) -> Tuple[float, Dict]:
+    # compute_edge_weight with the settings from resolve_coeffs
+    mode_key, time_slot, coeff_vec, tm_vec = resolved
+    risks, dist01 = _edge_risks(edge, mode_key, time_slot)
 
     total = 0.0
     breakdown = {}
-    for feat, risk in risks.items():
-        coeff = coeffs.get(feat, 0.0) # get the coefficient from our presets
-        tm = 1.0 # time multiplier
-        if feat in ("crime", "lighting", "traffic_density"):
-            tm = tms.get(feat, 1.0)
-        
+    # coeff from our presets (or the user's), tm = time multiplier
+    for feat, risk, coeff, tm in zip(FEATS, risks, coeff_vec, tm_vec):
         contrib = risk * coeff * tm
         
         
@@ -168,3 +282,99 @@ def compute_edge_weight(edge: dict, mode: str, time_of_day: str, custom_weights:
 
 
     return round(total,6), breakdown
+
+def _score_all(risks, coeffs, tms, dist01):
+    # risks is (n_feats, n_edges). same sum as _edge_weight,
+    # feature by feature, for every edge (only run through _numba_score_all)
+    n_feats, n = risks.shape
+    out = np.empty(n)
+    for i in range(n):
+        total = 0.0
+        for f in range(n_feats):
+            total += risks[f, i] * coeffs[f] * tms[f]
+        out[i] = total + 0.5 * dist01[i]
+    return out
+
+_SCORE_KERNEL = None
+
+def _numba_score_all():
+    # _score_all compiled by numba (or loaded from its cache), the first
+    # time theres enough edges for it
+    global _SCORE_KERNEL
+    if _SCORE_KERNEL is None:
+        from numba import njit
+        _SCORE_KERNEL = njit(cache=True)(_score_all)
+    return _SCORE_KERNEL
+
+# numpy versions of _u_shaped_crowd / _police_risk for _risks_from_attrs
+def _u_shaped_crowd_np(crowd):
+    return np.array(_CROWD_TABLE)[(~(crowd < 0.2)).astype(np.intp) + ~(crowd < 0.5) + ~(crowd < 0.8)]
+
+def _police_risk_np(nearest_police):
+    return 1.0 - np.clip(np.minimum(nearest_police, POLICE_CAP) / POLICE_CAP, 0.0, 1.0)
+
+def _bulk_risks(edges: List[dict], mode_key: str, time_slot: str):
+    # (ids, risks, dist01) for compute_edge_weights_bulk. risks is a
+    # (n_feats, n_edges) contiguous array in FEATS order. rebuilt on every
+    # call since edge attributes can be edited in place between queries
+
+    # one array per attribute (edges without an id are skipped, like in main.py)
+    id_edges = [e for e in edges if e.get("id")]
+    if not id_edges:
+        return [], None, None
+    ids = [e["id"] for e in id_edges]
+    rows = [_raw_attrs(e, mode_key, time_slot) for e in id_edges]
+
+    # numpy does all the float() conversions in one go. anything it cant
+    # take as is (None, "abc", nan, ...) goes through _edge_attrs instead,
+    # which knows how _to01 treats those
+    try:
+        raw = np.array(rows, dtype=np.float64)
+        ok = not np.isnan(raw).any()
+    except (TypeError, ValueError, OverflowError):
+        ok = False
+
+    # attribute-major and contiguous, so every column op below walks
+    # memory in order (plain .T would be a strided view)
+    if ok:
+        attrs = np.ascontiguousarray(raw.T)
+        attrs[0] = np.clip(attrs[0] / DIST_CAP, 0.0, 1.0)
+        attrs[_SCORE_COLS] = np.clip(attrs[_SCORE_COLS] / 10.0, 0.0, 1.0)
+    else:
+        rows = [_edge_attrs(e, mode_key, time_slot) for e in id_edges]
+        attrs = np.ascontiguousarray(np.array(rows, dtype=np.float64).T)
+
+    # same risk metrics as compute_edge_weight, on whole columns
+    risks, dist01 = _risks_from_attrs(attrs, _u_shaped_crowd_np, _police_risk_np)
+    return ids, np.stack(risks), dist01
+
+def compute_edge_weights_bulk(edges: List[dict], mode: str, time_of_day: str, custom_weights: Dict[str, float]=None) -> Dict[str, float]:
+    """
+    Same weights as compute_edge_weight, but for a whole list of edges
+    at once and without the breakdowns.
+    Returns edge_id -> weight, ready to use as a weight_map.
+    """
+    mode_key = _get_mode_key(mode)
+    time_slot = _get_time_slot(time_of_day)
+    coeff_vec, tm_vec = _feat_coeffs(mode_key, time_slot, custom_weights)
+
+    if not HAVE_NUMPY or len(edges) < NUMPY_MIN_EDGES:
+        return {e["id"]: round(_edge_weight(e, mode_key, time_slot, coeff_vec, tm_vec), 6)
+                for e in edges if e.get("id")}
+
+    _load_numpy()
+    ids, risks, dist01 = _bulk_risks(edges, mode_key, time_slot)
+    if not ids:
+        return {}
+
+    # add the features up one by one in the same order as the scalar
+    # version, so the floats come out exactly the same
+    if HAVE_NUMBA and len(ids) >= NUMBA_MIN_EDGES:
+        total = _numba_score_all()(risks, np.array(coeff_vec), np.array(tm_vec), dist01)
+    else:
+        total = np.zeros(len(ids))
+        for risk, coeff, tm in zip(risks, coeff_vec, tm_vec):
+            total += risk * coeff * tm
+        total += 0.5 * dist01
+
+    return {eid: round(w, 6) for eid, w in zip(ids, total.tolist())}
@@ -1,9 +1,13 @@
 # main.py
 # This is the main file that runs the UI part.
-from graph_loader import build_graph
-from safety_scoring import compute_edge_weight, DIST_CAP, MODE_PRESETS
-from pathfinder import dijkstra, yen_k_shortest, distance_map
+from graph_loader import build_graph, build_csr
+from safety_scoring import (edge_weight_breakdown, resolve_coeffs, compute_edge_weights_bulk,
+                            DIST_CAP, MODE_PRESETS)
+from pathfinder import (dijkstra_pairs_csr, dijkstra_multi_csr, yen_k_shortest_csr, add_weight_column,
+                        composite_weights, MutationStack, warmup as warmup_pathfinder)
+from array import array
 from datetime import datetime
+import bisect
 import copy
 import json, os
 
@@ -19,7 +23,24 @@ except Exception:
 
 
 
-def parse_node_choice(user_input: str, nodes_sorted: list, nodes_dict: dict):
+def build_node_lookup(nodes_sorted, nodes_dict):
+    # upper case id -> id and upper case name -> id, built once so typing
+    # a location is a dict lookup instead of a scan. setdefault keeps the
+    # first match in sorted order, like the scan did.
+    # names is a sorted list of (upper case name, id) for prefix matches
+    by_id = {}
+    by_name = {}
+    names = []
+    for nid in nodes_sorted:
+        by_id.setdefault(nid.upper(), nid)
+        name = nodes_dict.get(nid, {}).get("name", "")
+        if name:
+            by_name.setdefault(name.strip().upper(), nid)
+            names.append((name.strip().upper(), nid))
+    names.sort()
+    return by_id, by_name, names
+
+def parse_node_choice(user_input: str, nodes_sorted: list, nodes_dict: dict, lookup=None):
     if user_input is None:
         return None
     s = user_input.strip()
@@ -31,21 +52,20 @@ def parse_node_choice(user_input: str, nodes_sorted: list, nodes_dict: dict):
             return nodes_sorted[idx]
         return None
 
+    if lookup is None:
+        lookup = build_node_lookup(nodes_sorted, nodes_dict)
+    by_id, by_name, names = lookup
     s_up = s.upper()
-    for nid in nodes_sorted:
-        if nid.upper() == s_up:
-            return nid
-    for nid in nodes_sorted:
-        name = nodes_dict.get(nid, {}).get("name", "")
-        if name and name.strip().upper() == s_up:
-            return nid
-    matches = []
-    for nid in nodes_sorted:
-        name = nodes_dict.get(nid, {}).get("name", "")
-        if name and name.strip().upper().startswith(s_up):
-            matches.append(nid)
-    if len(matches) == 1:
-        return matches[0]
+    nid = by_id.get(s_up) or by_name.get(s_up)
+    if nid is not None:
+        return nid
+
+    # names starting with s_up are all next to each other in the sorted
+    # list, so jump to the first one and only look at those
+    i = bisect.bisect_left(names, (s_up,))
+    if i < len(names) and names[i][0].startswith(s_up):
+        if i + 1 == len(names) or not names[i + 1][0].startswith(s_up):
+            return names[i][1] # exactly one match
     return None
 
 def show_locations_friendly(nodes):
@@ -100,24 +120,31 @@ def display_route(title, nodes_seq, cost, edges, breakdowns, mode="walking", wei
         print(f"{title}: No route found.")
         return
 
-    # total distance
-    total_distance = sum(int(e.get("distance_m", 0)) for e in edges)
-
-    speed_kmh = {"walking": 5.0, "two_wheeler": 20.0, "car": 40.0}
-    sp = speed_kmh.get(mode, 5.0)
-    est_minutes = (total_distance / 1000.0) / sp * 60.0
+    # total distance and safety score in one walk over the edges
+    # breakdowns is normally a LazyBreakdowns (cached contribs), but a
+    # plain edge_id -> breakdown dict works too
+    contribs = getattr(breakdowns, "contribs", None)
+    total_distance = 0
     total_safety = 0.0
     for e in edges:
-        eid = e.get("id")
-        bd = breakdowns.get(eid, {})
+        total_distance += int(e.get("distance_m", 0))
+        if contribs is not None:
+            for c in contribs(e.get("id")):
+                total_safety += c
+            continue
+        bd = breakdowns.get(e.get("id"), {})
         if isinstance(bd, dict):
-            for k, v in bd.items():
+            for v in bd.values():
                 if isinstance(v, dict) and "contrib" in v:
                     try:
                         total_safety += float(v["contrib"])
-                    except:
+                    except (TypeError, ValueError):
                         pass
-    
+
+    speed_kmh = {"walking": 5.0, "two_wheeler": 20.0, "car": 40.0}
+    sp = speed_kmh.get(mode, 5.0)
+    est_minutes = (total_distance / 1000.0) / sp * 60.0
+
     safety_msg = "safer" if total_safety < 5 else ("moderately safe" if total_safety < 12 else "less safe")
     print(f"{title}")
     print(f"  Route: {' → '.join(nodes_seq)}")
@@ -133,17 +160,28 @@ def display_route(title, nodes_seq, cost, edges, breakdowns, mode="walking", wei
 
 if HAVE_PLOTTING:
     def build_networkx_graph(nodes_dict, edges_list):
+        # everything in two bulk calls instead of one add per node / edge
         G = nx.Graph()
-        for nid, meta in nodes_dict.items():
-            G.add_node(nid, name=meta.get("name", nid))
-        for e in edges_list:
-            u, v = e["u"], e["v"]
-            G.add_edge(u, v, id=e.get("id"), distance_m=e.get("distance_m", 0), edge_obj=e)
+        G.add_nodes_from((nid, {"name": meta.get("name", nid)}) for nid, meta in nodes_dict.items())
+        G.add_edges_from((e["u"], e["v"], {"id": e.get("id"), "distance_m": e.get("distance_m", 0), "edge_obj": e})
+                         for e in edges_list)
         return G
 
-    def plot_full_graph(nodes, edges):
+    # (nodes, edges, G, pos) of the last graph drawn. spring_layout is the
+    # slow part of plotting and the graph doesnt change during a session
+    _PLOT_CACHE = []
+
+    def graph_and_layout(nodes, edges):
+        if _PLOT_CACHE and _PLOT_CACHE[0] is nodes and _PLOT_CACHE[1] is edges:
+            return _PLOT_CACHE[2], _PLOT_CACHE[3]
         G = build_networkx_graph(nodes, edges)
         pos = nx.spring_layout(G, seed=42) # seed makes it look the same every time
+        _PLOT_CACHE[:] = [nodes, edges, G, pos]
+        return G, pos
+
+    def plot_full_graph(nodes, edges, G=None, pos=None):
+        if G is None or pos is None:
+            G, pos = graph_and_layout(nodes, edges)
         plt.figure(figsize=(8,6))
         nx.draw_networkx_nodes(G, pos, node_color="skyblue", node_size=700)
         nx.draw_networkx_edges(G, pos, width=1.0, alpha=0.7)
@@ -156,11 +194,11 @@ if HAVE_PLOTTING:
         plt.tight_layout()
         plt.show()
 
-    def plot_path_highlight(nodes, edges, path_nodes):
+    def plot_path_highlight(nodes, edges, path_nodes, G=None, pos=None):
         if not path_nodes:
             return
-        G = build_networkx_graph(nodes, edges)
-        pos = nx.spring_layout(G, seed=42)
+        if G is None or pos is None:
+            G, pos = graph_and_layout(nodes, edges)
         plt.figure(figsize=(8,6))
         
         nx.draw_networkx_nodes(G, pos, node_color="lightgray", node_size=500)
@@ -205,21 +243,49 @@ def ask_choice(prompt, options):
 def ask_choice_simple(prompt, options):
     return ask_choice(prompt, options)
 
-def chain_must_pass(adj, start, must_pass_nodes, end, weight_map):
+# must-pass legs from earlier runs, see chain_must_pass
+_SEG_CACHE = {}
+_SEG_CACHE_MAX = 256
+
+def chain_must_pass(csr, start, must_pass_nodes, end, weights, mask=None):
     """
     for handling the must pass nodes.
     It just runs dijkstra from one point to the next.
     start -> must1, then must1 -> must2, .... anghane
     returns (full_node_sequence, total_cost, edge_list)
     """
-    from pathfinder import dijkstra 
     seg_nodes = []
     seg_edges = []
     total_cost = 0.0
-    cur = start
 
-    for mp in must_pass_nodes + [end]:
-        nodes_part, cost_part, edges_part = dijkstra(adj, cur, mp, weight_map)
+    # a recompute usually keeps most of the stops, so the legs are cached
+    # by (weights, avoid state, from, to) and only the new ones get searched
+    if weights is None:
+        weights = csr["weights"] # so the key is tied to this graph
+    state = None if mask is None else bytes(mask.skip_node)
+    stops = [start] + must_pass_nodes + [end]
+    legs = {}
+    missing = []
+    for a, b in zip(stops, stops[1:]):
+        hit = _SEG_CACHE.get((id(weights), state, a, b))
+        if hit is not None and hit[0] is weights:
+            legs[a, b] = hit[1]
+        elif (a, b) not in legs:
+            legs[a, b] = None
+            missing.append((a, b))
+
+    # the new legs share one set of skip flags in dijkstra_pairs_csr and
+    # are searched one after the other
+    if missing:
+        for (a, b), leg in zip(missing, dijkstra_pairs_csr(csr, missing, weights, mask=mask)):
+            legs[a, b] = leg
+            if len(_SEG_CACHE) >= _SEG_CACHE_MAX:
+                del _SEG_CACHE[next(iter(_SEG_CACHE))] # drop the oldest
+            # weights kept in the entry so its id cant be reused while cached
+            _SEG_CACHE[id(weights), state, a, b] = (weights, leg)
+
+    for a, b in zip(stops, stops[1:]):
+        nodes_part, cost_part, edges_part = legs[a, b]
         if nodes_part is None:
             return None, float('inf'), None
 
@@ -229,17 +295,16 @@ def chain_must_pass(adj, start, must_pass_nodes, end, weight_map):
             seg_nodes += nodes_part[1:]
         seg_edges += edges_part
         total_cost += cost_part
-        cur = mp
 
     return seg_nodes, total_cost, seg_edges
 
-def ask_node(prompt, nodes_sorted, nodes_dict):
+def ask_node(prompt, nodes_sorted, nodes_dict, lookup=None):
     """Ask user to select a node and return the node id."""
     while True:
         user_input = input(f"{prompt} ").strip()
         if not user_input:
             continue
-        nid = parse_node_choice(user_input, nodes_sorted, nodes_dict)
+        nid = parse_node_choice(user_input, nodes_sorted, nodes_dict, lookup)
         if nid:
             return nid
         print("Location not found. Please try again or type 'list' to show available locations.")
@@ -277,38 +342,108 @@ def parse_coeff_overrides(raw: str):
             continue
     return out
 
+class LazyBreakdowns:
+    # edge_id -> breakdown dict, but a breakdown is only worked out the
+    # first time someone asks for it. only the edges on the shown routes
+    # (or the one typed in) ever get looked at
+    def __init__(self, edges, mode, time_of_day, custom_weights):
+        self._edges = {e["id"]: e for e in edges if e.get("id")}
+        # mode / time / overrides turned into coefficient vectors once
+        self._resolved = resolve_coeffs(mode, time_of_day, custom_weights)
+        self._done = {}
+        self._contribs = {}
+
+    def __contains__(self, eid):
+        return eid in self._edges
+
+    def keys(self):
+        return self._edges.keys()
+
+    def get(self, eid, default=None):
+        if eid not in self._edges:
+            return default
+        bd = self._done.get(eid)
+        if bd is None:
+            # to calls the function from safety_scoring.py
+            bd = edge_weight_breakdown(self._edges[eid], self._resolved)[1]
+            self._done[eid] = bd
+        return bd
+
+    def contribs(self, eid):
+        # the "contrib" floats out of the breakdown (what the route summary
+        # adds up), dug out once per edge instead of on every display
+        out = self._contribs.get(eid)
+        if out is None:
+            vals = []
+            for v in self.get(eid, {}).values():
+                if isinstance(v, dict) and "contrib" in v:
+                    try:
+                        vals.append(float(v["contrib"]))
+                    except (TypeError, ValueError):
+                        pass
+            out = self._contribs[eid] = tuple(vals)
+        return out
+
+# (id(edges), mode, time_of_day, overrides) -> (edges, safety_map, breakdowns)
+# the edges from build_graph dont change during a session, so asking for
+# the same mode / time / overrides again (recompute loop) reuses the maps
+_WEIGHT_CACHE = {}
+_WEIGHT_CACHE_MAX = 16
+
+def _overrides_key(custom_weights):
+    # hashable version of the custom weights, ("mul", x) lists become tuples
+    if not custom_weights:
+        return ()
+    return tuple(sorted(((k, tuple(v) if isinstance(v, list) else v) for k, v in custom_weights.items()),
+                        key=lambda kv: kv[0]))
+
 def build_edge_weights_with_overrides(edges, mode, time_of_day, custom_weights):
     """
     Returns (safety_map, breakdowns)
     safety_map: edge_id -> weight (float)
-    breakdowns: edge_id -> breakdown dict returned from compute_edge_weight
+    breakdowns: edge_id -> breakdown dict from compute_edge_weight (LazyBreakdowns)
+    Results are cached per mode / time / overrides, dont modify them.
     """
-    safety_map = {}
-    breakdowns = {}
-    for e in edges:
-        eid = e.get("id")
-        if not eid:
-            continue
-        # to calls the function from safety_scoring.py
-        w, bd = compute_edge_weight(e, mode, time_of_day, custom_weights)
-        safety_map[eid] = float(w)
-        breakdowns[eid] = bd
+    key = (id(edges), mode, time_of_day, _overrides_key(custom_weights))
+    hit = _WEIGHT_CACHE.get(key)
+    if hit is not None and hit[0] is edges:
+        return hit[1], hit[2]
+
+    # all the weights in one go, the breakdowns only when theyre shown
+    safety_map = compute_edge_weights_bulk(edges, mode, time_of_day, custom_weights)
+    breakdowns = LazyBreakdowns(edges, mode, time_of_day, custom_weights)
+    if len(_WEIGHT_CACHE) >= _WEIGHT_CACHE_MAX:
+        del _WEIGHT_CACHE[next(iter(_WEIGHT_CACHE))] # drop the oldest
+    # edges is kept in the entry so its id cant be reused while cached
+    _WEIGHT_CACHE[key] = (edges, safety_map, breakdowns)
     return safety_map, breakdowns
 
-def prune_graph_remove_nodes(adj, avoid_set):
-    avoid_set = set(avoid_set or [])
-    new_adj = {}
-    for n, nbrs in adj.items():
-        if n in avoid_set:
-            continue
-        new_nbrs = []
-        for v, e in nbrs:
-            if v in avoid_set:
-                continue
-            # to skip edges that reference the removed nodes
-            new_nbrs.append((v, e))
-        new_adj[n] = new_nbrs
-    return new_adj
+def add_dist_norm_column(csr):
+    # distance scaled to 0..1 (capped), only depends on the graph so its
+    # worked out once at startup
+    csr["columns"]["dist_norm"] = array("d", [min(d / DIST_CAP, 1.0) for d in csr["columns"]["distance_m"]])
+
+def build_weight_arrays(csr, safety_map, balance=1.0):
+    """
+    Returns (safety_w, combined_w), one weight per edge of csr (indexed
+    like csr["edge_list"]) so the pathfinder never looks up an edge id.
+    combined = safety weight + balance * normalised distance, used for
+    the balanced routes.
+    """
+    safety_w = add_weight_column(csr, "safety", safety_map)
+    combined_w = composite_weights(csr, {"safety": 1.0, "dist_norm": balance})
+    return safety_w, combined_w
+
+def prune_graph_remove_nodes(mask, avoid_set):
+    # marks the avoid nodes as removed in mask (a MutationStack on the
+    # csr), the searches skip them. the graph itself isnt copied, and the
+    # previous avoid list is undone first so the same mask can be reused
+    mask.restore_all()
+    node_to_idx = mask.csr["node_to_idx"]
+    for nid in set(avoid_set or []):
+        if nid in node_to_idx:
+            mask.remove_node(nid)
+    return mask
 
 def ask_custom_importance(mode_key: str):
     presets = MODE_PRESETS.get(mode_key, {})
@@ -351,9 +486,21 @@ def ask_custom_importance(mode_key: str):
 def main_loop():
     print("Loading graph data...")
     nodes, edges, adj = build_graph()
-    nodes_sorted = sorted(nodes.keys())
+    nodes_sorted = tuple(sorted(nodes.keys()))
+    node_lookup = build_node_lookup(nodes_sorted, nodes)
     print(f"Loaded {len(nodes)} locations and {len(edges)} paths.")
 
+    # int indexed graph, all the searches run on this one with a weight
+    # array per objective instead of an edge id -> weight dict
+    csr = build_csr(nodes, edges)
+    add_dist_norm_column(csr)
+    dist_w = csr["columns"]["distance_m"]
+    # removed nodes (the avoid list), reused for every recompute
+    avoid_mask = MutationStack(csr)
+    # if the graph is big enough for numba, get its compile out of the
+    # way while were loading anyway
+    warmup_pathfinder(csr)
+
     # optional: show full graph initially
     if HAVE_PLOTTING:
         try:
@@ -364,11 +511,11 @@ def main_loop():
     show_locations_friendly(nodes)
 
     # pick start/end
-    start = ask_node("Where are you starting from?", nodes_sorted, nodes)
-    end = ask_node("Where would you like to go?", nodes_sorted, nodes)
+    start = ask_node("Where are you starting from?", nodes_sorted, nodes, node_lookup)
+    end = ask_node("Where would you like to go?", nodes_sorted, nodes, node_lookup)
     while end == start:
         print("Destination cannot be the same as your starting point. Please choose a different destination.")
-        end = ask_node("Where would you like to go?", nodes_sorted, nodes)
+        end = ask_node("Where would you like to go?", nodes_sorted, nodes, node_lookup)
 
     mode = ask_choice("How will you travel?", ["walking", "two_wheeler", "car"])
 
@@ -400,34 +547,31 @@ def main_loop():
     safety_map, breakdowns = build_edge_weights_with_overrides(edges, mode, time_of_day, custom_weights)
     
 
+    safety_w, combined_w = build_weight_arrays(csr, safety_map)
+
     # initial pruning (remove "avoid" nodes)
-    adj_pruned = prune_graph_remove_nodes(adj, set(avoid_nodes))
+    prune_graph_remove_nodes(avoid_mask, avoid_nodes)
 
     print("Running pathfinders...")
     # pathfinding (distance, safety, combined)
-    # Shortest path
-    dist_map = distance_map(adj_pruned)
-    dpath_nodes, dpath_cost, dpath_edges = dijkstra(adj_pruned, start, end, dist_map)
-
-
-    # Safest path
-    safe_nodes, safe_cost, safe_edges = dijkstra(adj_pruned, start, end, safety_map)
+    # Shortest and safest path, same start / end / avoid list so one call
+    (dpath_nodes, dpath_cost, dpath_edges), (safe_nodes, safe_cost, safe_edges) = \
+        dijkstra_multi_csr(csr, start, end, [dist_w, safety_w], mask=avoid_mask)
     
 
     # Balanced pathsusing Yen's
-    combined_map = {}
-    for eid, s in safety_map.items():
-        d_norm = min(dist_map.get(eid, 0.0) / DIST_CAP, 1.0)
-        combined_map[eid] = s + 1.0 * d_norm # balance factor 1.0
-    kpaths = yen_k_shortest(adj_pruned, start, end, combined_map, K=3)
+    kpaths = yen_k_shortest_csr(csr, start, end, combined_w, K=3, mask=avoid_mask)
     print("...Done finding routes!")
 
 
-    if must_pass_nodes:
-        chain_nodes = None
+    # route through the mandatory stops, run again on every recompute
+    # (legs that didnt change come out of chain_must_pass's cache)
+    def show_must_pass_route():
+        if not must_pass_nodes:
+            return
         print("Calculating mandatory stop route...")
         try:
-            chain_nodes, chain_cost, chain_edges = chain_must_pass(adj_pruned, start, must_pass_nodes, end, combined_map)
+            chain_nodes, chain_cost, chain_edges = chain_must_pass(csr, start, must_pass_nodes, end, combined_w, avoid_mask)
             if chain_nodes is None:
                 print("Could not compute a route that visits all mandatory stops in the requested order.")
             else:
@@ -435,7 +579,7 @@ def main_loop():
                 display_route("Route with required stops", chain_nodes, chain_cost, chain_edges, breakdowns, mode=mode, weight_kind="mixed")
         except Exception:
             print("Error trying to calculate mandatory stop route.")
-            pass
+    show_must_pass_route()
 
     # display candidate routes
     def show_candidates():
@@ -448,7 +592,13 @@ def main_loop():
         else:
             for i, (nodes_i, cost_i, edges_i) in enumerate(kpaths, 1):
                 display_route(f"  Option {i}", nodes_i, cost_i, edges_i, breakdowns, mode=mode, weight_kind="mixed")
-    show_candidates()
+        # the accept menu, in the order its numbered (1 = Shortest, ...)
+        routes = [("Shortest", dpath_nodes, dpath_cost, dpath_edges),
+                  ("Safest", safe_nodes, safe_cost, safe_edges)]
+        for i, (nodes_i, cost_i, edges_i) in enumerate(kpaths, 1):
+            routes.append((f"Balanced Option {i}", nodes_i, cost_i, edges_i))
+        return routes
+    chosen_routes = show_candidates()
 
 
     # Interaction loop (accept or recompute)
@@ -463,25 +613,16 @@ def main_loop():
 
         if choice == "1":
             print("Which route to accept?")
-            print("  1. Shortest")
-            print("  2. Safest")
-            for i in range(len(kpaths)):
-                print(f"  {3+i}. Balanced Option {i+1}")
+            for i, route in enumerate(chosen_routes, 1):
+                label = route[0]
+                print(f"  {i}. {label}")
             pick = input("Choose number: ").strip()
             try:
                 p = int(pick)
-                if p == 1:
-                    chosen = ("Shortest", dpath_nodes, dpath_cost, dpath_edges)
-                elif p == 2:
-                    chosen = ("Safest", safe_nodes, safe_cost, safe_edges)
-                else:
-                    idx = p - 3
-                    if 0 <= idx < len(kpaths):
-                        nodes_i, cost_i, edges_i = kpaths[idx]
-                        chosen = (f"Balanced Option {idx+1}", nodes_i, cost_i, edges_i)
-                    else:
-                        print("Invalid choice.")
-                        continue
+                if not 1 <= p <= len(chosen_routes):
+                    print("Invalid choice.")
+                    continue
+                chosen = chosen_routes[p - 1]
                 print("\n=== FINAL ROUTE SELECTED ===")
                 display_route(chosen[0], chosen[1], chosen[2], chosen[3], breakdowns, weight_kind="mixed")
                 
@@ -501,6 +642,7 @@ def main_loop():
         elif choice == "2":
             # allow user to update avoid nodes, must-pass, or custom weights (or keep the same)
             print("Update constraints and/or custom weights.")
+            prev_avoid = set(avoid_nodes)
             avoid_nodes_raw = ask_text(f"Avoid nodes (current: {avoid_nodes}, or press Enter to keep): ")
             if avoid_nodes_raw.strip():
                 avoid_nodes = [x.strip().upper() for x in avoid_nodes_raw.split(",") if x.strip()]
@@ -522,22 +664,29 @@ def main_loop():
                 custom_weights = {}
 
             # to recompute everything
+            prev_safety_map = safety_map
             safety_map, breakdowns = build_edge_weights_with_overrides(edges, mode, time_of_day, custom_weights)
+            # same weights as last time (only avoid / must-pass changed),
+            # then the arrays from last time are still right too
+            if safety_map is not prev_safety_map:
+                safety_w, combined_w = build_weight_arrays(csr, safety_map)
             
-            adj_pruned = prune_graph_remove_nodes(adj, set(avoid_nodes))
-            
-            dist_map = distance_map(adj_pruned)
-            dpath_nodes, dpath_cost, dpath_edges = dijkstra(adj_pruned, start, end, dist_map)
-            safe_nodes, safe_cost, safe_edges = dijkstra(adj_pruned, start, end, safety_map)
-            
-            combined_map = {}
-            for eid, s in safety_map.items():
-                d_norm = min(dist_map.get(eid, 0.0) / DIST_CAP, 1.0)
-                combined_map[eid] = s + 1.0 * d_norm
-            kpaths = yen_k_shortest(adj_pruned, start, end, combined_map, K=3)
+            # the routes only depend on the weights and the avoid list, if
+            # neither changed (just the must-pass stops) theyre the same
+            # as last time, Yen included
+            if safety_map is not prev_safety_map or set(avoid_nodes) != prev_avoid:
+                prune_graph_remove_nodes(avoid_mask, avoid_nodes)
+                
+                (dpath_nodes, dpath_cost, dpath_edges), (safe_nodes, safe_cost, safe_edges) = \
+                    dijkstra_multi_csr(csr, start, end, [dist_w, safety_w], mask=avoid_mask)
+                
+                kpaths = yen_k_shortest_csr(csr, start, end, combined_w, K=3, mask=avoid_mask)
+
+            # the must-pass route too, the stops may have changed
+            show_must_pass_route()
 
             # to show updated candidates
-            show_candidates()
+            chosen_routes = show_candidates()
             
             continue #  Let's Go back to the option loop
 